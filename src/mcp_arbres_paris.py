@@ -19,19 +19,451 @@ Author: mfnunez
 Repository: https://github.com/mfnunez/mcp-arbres-paris-open-data
 """
 
+import asyncio
+import io
+import json
+import math
 import os
-from typing import Optional, Any
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional, Any, AsyncIterator, Final
 import httpx
+from cachetools import TTLCache
 from mcp.server.fastmcp import FastMCP
 
-# Initialize FastMCP server
-mcp = FastMCP("Paris Trees")
+# orjson decodes API payloads much faster than the stdlib json module;
+# fall back to httpx's own decoding when it isn't installed
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Output formats accepted by the tree listing tools
+OUTPUT_FORMATS: Final = ("text", "json")
 
 # API Configuration
-BASE_URL = "https://opendata.paris.fr/api/explore/v2.1"
-DATASET_ID = "les-arbres"
-DEFAULT_LIMIT = 20
-MAX_LIMIT = 100
+BASE_URL: Final = "https://opendata.paris.fr/api/explore/v2.1"
+DATASET_ID: Final = "les-arbres"
+# Endpoint paths (relative to BASE_URL), built once at import time
+DATASET_ENDPOINT: Final = f"/catalog/datasets/{DATASET_ID}"
+RECORDS_ENDPOINT: Final = f"{DATASET_ENDPOINT}/records"
+DEFAULT_LIMIT: Final = 20
+MAX_LIMIT: Final = 100
+# The records endpoint rejects queries with offset + limit above this window
+MAX_RESULT_WINDOW: Final = 10_000
+# Largest search radius accepted by find_trees_near_location (Paris fits in it)
+MAX_DISTANCE_METERS: Final = 50_000
+# Upstream protection: bound the number of in-flight API requests and retry
+# rate-limited / transient gateway errors with exponential backoff
+MAX_CONCURRENT_REQUESTS: Final = 16
+MAX_RETRIES: Final = 3
+_RETRY_STATUSES: Final = frozenset((429, 502, 503, 504))
+
+# In-process response cache: the dataset is refreshed at most daily, so
+# identical queries within the TTL are served without an HTTP round trip
+RESPONSE_CACHE_TTL: Final = 3600
+_CACHE: Final[TTLCache] = TTLCache(maxsize=512, ttl=RESPONSE_CACHE_TTL)
+_LOCKS: Final[dict[tuple, asyncio.Lock]] = {}
+
+# Rendered get_dataset_info output as (monotonic timestamp, text); the
+# dataset metadata only changes every few weeks
+DATASET_INFO_TTL: Final = 86400
+_DATASET_INFO_CACHE: tuple[float, str] | None = None
+_DATASET_INFO_LOCK: Final = asyncio.Lock()
+
+# Fields rendered by the tree listing tools; requesting only these keeps the
+# API from returning every column of the dataset
+_DEFAULT_SELECT: Final = (
+    "libellefrancais,genre,hauteurenm,circonferenceencm,arrondissement,"
+    "adresse,stadedeveloppement,remarquable,geo_point_2d"
+)
+_NEARBY_SELECT: Final = "libellefrancais,hauteurenm,arrondissement,adresse,remarquable,geo_point_2d"
+_SPECIES_EXAMPLE_SELECT: Final = "hauteurenm,circonferenceencm,arrondissement,adresse,remarquable"
+
+# Fixed part of each tool's query (read-only); tools merge in the dynamic
+# values
+_NEARBY_PARAMS_BASE: Final = MappingProxyType({"select": _NEARBY_SELECT})
+_REMARKABLE_PARAMS_BASE: Final = MappingProxyType({
+    "select": _DEFAULT_SELECT,
+    # Sort by height descending to show most impressive trees first
+    "order_by": "hauteurenm DESC"
+})
+# IMPORTANT: Use SELECT with count() aggregation for v2.1 API
+_SPECIES_STATS_PARAMS_BASE: Final = MappingProxyType({
+    "select": "arrondissement, count(*) as tree_count",
+    "group_by": "arrondissement",
+    "limit": 20,
+    "order_by": "tree_count DESC"
+})
+# Plain count(*) without GROUP BY: the exact number of matching trees,
+# independent of how many groups a grouped query returns
+_TOTAL_PARAMS_BASE: Final = MappingProxyType({"select": "count(*) as total"})
+_SPECIES_EXAMPLES_PARAMS_BASE: Final = MappingProxyType({
+    "select": _SPECIES_EXAMPLE_SELECT,
+    "limit": 5,
+    "order_by": "hauteurenm DESC"
+})
+
+# Spellings of the 'remarquable' flag that mark a heritage tree
+_REMARQUABLE_TRUE: Final = frozenset(("OUI", "oui", "Oui"))
+
+# Per-record output templates, rendered by _render_tree
+_TREE_TMPL: Final = (
+    "\n{i}. Tree Information:\n"
+    "   Species: {t.species}\n"
+    "   Genus: {t.genus}\n"
+    "   Height: {t.height} m\n"
+    "   Circumference: {t.circumference} cm\n"
+    "   District: {t.district}\n"
+    "   Address: {t.address}\n"
+    "   Stage of Development: {t.stage}"
+)
+_NEARBY_TREE_TMPL: Final = (
+    "\n{i}. {t.species} {remarquable_status}\n"
+    "   Height: {t.height} m\n"
+    "   Address: {t.address}\n"
+    "   District: {t.district}\n"
+    "   Distance: {distance} m\n"
+    "   Coordinates: {t.coords_text}"
+)
+_REMARKABLE_TREE_TMPL: Final = (
+    "\n{i}. {t.species} 🌟\n"
+    "   Height: {t.height} m\n"
+    "   Circumference: {t.circumference} cm\n"
+    "   Address: {t.address}\n"
+    "   District: {t.district}\n"
+    "   Stage: {t.stage}"
+)
+_SPECIES_EXAMPLE_TMPL: Final = (
+    "\n  {i}. Height: {t.height} m{remarquable_indicator}\n"
+    "     Location: {t.address}\n"
+    "     District: {t.district}\n"
+    "     Circumference: {t.circumference} cm"
+)
+
+# Single-line addition written once per district group
+_DISTRICT_LINE_TMPL: Final = "\n  - {}: {:,} trees"
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize an API payload to a JSON string (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def _total_from(result: Any) -> int | None:
+    """Extract the count from a _TOTAL_PARAMS_BASE query result, or None if it failed."""
+    if isinstance(result, BaseException):
+        return None
+    rows = result.get("results") or [{}]
+    return rows[0].get("total")
+
+
+def _clamp_limit(n: int) -> int:
+    """Clamp a requested page size to the range accepted by the API (1..MAX_LIMIT)."""
+    return 1 if n < 1 else (MAX_LIMIT if n > MAX_LIMIT else n)
+
+
+def _validate_geo(latitude: float, longitude: float) -> None:
+    """
+    Check that a coordinate pair is a valid WGS84 position.
+    
+    Raises:
+        ValueError: If latitude or longitude is out of range
+    """
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(
+            f"invalid coordinates ({latitude}, {longitude}); latitude must be "
+            f"within [-90, 90] and longitude within [-180, 180]"
+        )
+
+
+def _coords(point: Any) -> tuple[float, float] | None:
+    """
+    Return (lat, lon) from a geo_point_2d value.
+    
+    Returns None if the point is missing, incomplete or not numeric, so
+    callers can format the pair as floats without guarding against errors.
+    """
+    try:
+        lat, lon = point["lat"], point["lon"]
+    except (KeyError, TypeError):
+        return None
+    if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+        return lat, lon
+    return None
+
+
+@dataclass(slots=True)
+class Tree:
+    """A tree record as rendered by the tools, with defaults for missing fields."""
+    species: Any
+    genus: Any
+    height: Any
+    circumference: Any
+    district: Any
+    address: Any
+    stage: Any
+    remarkable: bool
+    coords: tuple[float, float] | None
+    
+    @property
+    def coords_text(self) -> str:
+        """The coordinates as "lat, lon" to 6 decimals, or "N/A" without them."""
+        coords = self.coords
+        if not coords:
+            return "N/A"
+        # A literal .6f spec in an f-string is faster than a "%.6f" template
+        # or format(x, spec)
+        return f"{coords[0]:.6f}, {coords[1]:.6f}"
+
+
+def _parse_tree(record: dict[str, Any]) -> Tree:
+    """
+    Parse an API record into a Tree in a single pass.
+    
+    In API v2.1 the data is directly in the record object; v1.x nested it
+    under record["fields"], which is still accepted.
+    """
+    get = record.get("fields", record).get
+    return Tree(
+        species=get("libellefrancais", "Unknown"),
+        genus=get("genre", "N/A"),
+        height=get("hauteurenm", "N/A"),
+        circumference=get("circonferenceencm", "N/A"),
+        district=get("arrondissement", "N/A"),
+        address=get("adresse", "N/A"),
+        stage=get("stadedeveloppement", "N/A"),
+        remarkable=get("remarquable") in _REMARQUABLE_TRUE,
+        coords=_coords(get("geo_point_2d")),
+    )
+
+
+def _render_tree(
+    template: str,
+    i: int,
+    tree: Tree,
+    *,
+    with_remarkable: bool = False,
+    with_coords: bool = False,
+    **extra: Any,
+) -> str:
+    """
+    Render one numbered tree entry from a per-record template.
+    
+    ``extra`` fills template fields beyond ``i`` and ``t``. The optional
+    trailing lines flag heritage trees and give the tree's coordinates when
+    it has them.
+    """
+    text = "\n" + template.format(i=i, t=tree, **extra)
+    if with_remarkable and tree.remarkable:
+        text += "\n   🌟 Remarkable Tree: Yes (heritage tree)"
+    if with_coords and tree.coords:
+        text += "\n   Coordinates: " + tree.coords_text
+    return text
+
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance in meters between two WGS84 points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * 6_371_000 * math.asin(math.sqrt(a))
+
+
+# Control characters are never valid in district or species names
+_CONTROL_CHARS: Final = re.compile(r"[\x00-\x1f\x7f]")
+
+# Tokens used by _normalize_where: string literals are left untouched,
+# everything between them is canonicalized
+_ODSQL_STRING: Final = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")""")
+_WS: Final = re.compile(r"\s+")
+# Runs of operator characters; only the runs in _OPERATORS are respaced
+_OP: Final = re.compile(r"\s*([<>=!]+)\s*")
+_OPERATORS: Final = frozenset(("<=", ">=", "!=", "<>", "=", "<", ">"))
+_FIELD_NAMES: Final = re.compile(
+    r"\b(libellefrancais|genre|espece|hauteurenm|circonferenceencm|arrondissement|"
+    r"adresse|stadedeveloppement|remarquable|geo_point_2d)\b",
+    re.IGNORECASE
+)
+
+
+def _space_operator(match: re.Match) -> str:
+    """re.sub callback for _OP: surround a known operator with single spaces."""
+    op = match.group(1)
+    return f" {op} " if op in _OPERATORS else match.group(0)
+
+
+def _normalize_where(where: str) -> str:
+    """
+    Canonicalize an ODSQL where clause so equivalent spellings share a cache key.
+    
+    Outside of string literals, whitespace is collapsed, comparison operators
+    are surrounded by single spaces and known field names are lowercased,
+    e.g. "HAUTEURENM>25" and "hauteurenm  > 25" both become "hauteurenm > 25".
+    Runs of operator characters that aren't a single known operator (such
+    as "=>") are left as written for the API to report.
+    """
+    parts = _ODSQL_STRING.split(where.strip())
+    # split() with a capturing group puts the literals at odd indexes
+    for idx in range(0, len(parts), 2):
+        part = _WS.sub(" ", parts[idx])
+        part = _OP.sub(_space_operator, part)
+        parts[idx] = _FIELD_NAMES.sub(lambda m: m.group(1).lower(), part)
+    return "".join(parts)
+
+
+def _quote_odsql(value: str) -> str:
+    """Quote a user-supplied value as an ODSQL string literal."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+# Shared HTTP client, created lazily on first use and reused by every tool
+# so that connections to opendata.paris.fr are kept alive between calls
+_CLIENT: httpx.AsyncClient | None = None
+
+# Bounds in-flight API requests to MAX_CONCURRENT_REQUESTS
+_SEMAPHORE: Final = asyncio.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# Speculative background requests (next-page prefetch); references are kept
+# here so the tasks aren't garbage-collected before they finish
+_BACKGROUND_TASKS: Final[set[asyncio.Task]] = set()
+
+# Number of server sessions currently inside _lifespan
+_ACTIVE_SESSIONS = 0
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the shared HTTP client, creating it on first use.
+    
+    The client keeps a pool of keep-alive connections and negotiates HTTP/2,
+    so consecutive (or concurrent) API requests reuse the same TCP/TLS
+    connection instead of performing a new handshake every time. Responses
+    are requested compressed; httpx advertises brotli alongside gzip and
+    deflate when the brotli package is installed.
+    
+    Returns:
+        The module-wide httpx.AsyncClient instance
+    """
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(
+            base_url=BASE_URL,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            http2=True
+        )
+    return _CLIENT
+
+
+async def close_client() -> None:
+    """
+    Close the shared HTTP client and release its pooled connections.
+    
+    Called by the server when its last session ends; scripts that drive the
+    tools from their own event loop should call it when they are done.
+    """
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """
+    Server lifespan hook.
+    
+    FastMCP enters this once per session (once per connection under the SSE
+    and streamable HTTP transports), while the HTTP client and background
+    prefetches are shared by the whole process. Sessions are therefore
+    counted, and shared resources are only released when the last one ends.
+    
+    On entry, open the shared HTTP client and, unless it is already cached,
+    warm the dataset info in the background so the first user query doesn't
+    pay for it. On exit, cancel that warm-up if it is still running; when no
+    session is left, also cancel pending prefetches and close the client.
+    """
+    global _ACTIVE_SESSIONS
+    _ACTIVE_SESSIONS += 1
+    get_client()
+    warmup = None
+    if _DATASET_INFO_CACHE is None:
+        warmup = asyncio.create_task(get_dataset_info())
+    try:
+        yield
+    finally:
+        _ACTIVE_SESSIONS -= 1
+        if warmup is not None and not warmup.done():
+            warmup.cancel()
+            try:
+                await warmup
+            except asyncio.CancelledError:
+                pass
+        if _ACTIVE_SESSIONS == 0:
+            for task in list(_BACKGROUND_TASKS):
+                task.cancel()
+            await close_client()
+
+
+# Initialize FastMCP server
+mcp = FastMCP("Paris Trees", lifespan=_lifespan)
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring a numeric Retry-After header."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), 30.0)
+        except ValueError:
+            pass  # HTTP-date form; fall back to exponential backoff
+    return 0.25 * 2 ** attempt + random.random() * 0.1
+
+
+async def _fetch_json(
+    endpoint: str,
+    params: Optional[dict] = None
+) -> dict[str, Any]:
+    """
+    Perform the actual GET request with the shared client and decode the body.
+    
+    At most MAX_CONCURRENT_REQUESTS requests are in flight at once. Responses
+    with a 429/502/503/504 status are retried up to MAX_RETRIES times.
+    
+    Raises:
+        httpx.HTTPStatusError: If the request fails
+    """
+    client = get_client()
+    for attempt in range(MAX_RETRIES + 1):
+        async with _SEMAPHORE:
+            response = await client.get(endpoint, params=params)
+        if response.status_code in _RETRY_STATUSES and attempt < MAX_RETRIES:
+            # Back off outside the semaphore so other requests can proceed
+            await asyncio.sleep(_retry_delay(response, attempt))
+            continue
+        break
+    response.raise_for_status()
+    if orjson is not None:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            # orjson only accepts UTF-8; decode the text with the declared
+            # charset and parse that instead
+            return json.loads(response.text)
+    return response.json()
+
+
+def _cache_key(endpoint: str, params: Optional[dict]) -> tuple:
+    """Build a hashable, order-independent cache key for a request."""
+    return (endpoint, tuple(sorted((params or {}).items())))
 
 
 async def make_api_request(
@@ -41,6 +473,10 @@ async def make_api_request(
     """
     Make an asynchronous HTTP GET request to the OpenDataSoft API.
     
+    Responses are cached in-process, keyed on the endpoint and query
+    parameters, for RESPONSE_CACHE_TTL seconds. Concurrent requests for the
+    same key share a single upstream call instead of all hitting the API.
+    
     Args:
         endpoint: API endpoint path (e.g., "/catalog/datasets/les-arbres/records")
         params: Optional dictionary of query parameters
@@ -51,12 +487,51 @@ async def make_api_request(
     Raises:
         httpx.HTTPStatusError: If the request fails
     """
-    url = f"{BASE_URL}{endpoint}"
+    key = _cache_key(endpoint, params)
+    if key in _CACHE:
+        return dict(_CACHE[key])
+    
+    # Single-flight: only the first caller for a key fetches, the others wait
+    # on the same lock and then read the freshly cached value
+    lock = _LOCKS.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            if key in _CACHE:
+                return dict(_CACHE[key])
+            result = await _fetch_json(endpoint, params)
+            _CACHE[key] = result
+            return dict(result)
+    finally:
+        if not lock.locked():
+            _LOCKS.pop(key, None)
+
+
+async def _get_records(params: dict) -> dict[str, Any]:
+    """Query the dataset's records endpoint (cached, see make_api_request)."""
+    return await make_api_request(RECORDS_ENDPOINT, params=params)
+
+
+def _prefetch_records(params: dict) -> None:
+    """
+    Start fetching a records page in the background to warm the response cache.
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+    A later make_api_request for the same params either hits the cache or
+    waits on the in-flight request (single-flight lock). Failures are ignored;
+    the real request will simply retry.
+    """
+    key = _cache_key(RECORDS_ENDPOINT, params)
+    if key in _CACHE or key in _LOCKS:
+        return
+    task = asyncio.create_task(_get_records(params))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_discard_background_task)
+
+
+def _discard_background_task(task: asyncio.Task) -> None:
+    """Done-callback for background tasks: drop the reference, swallow errors."""
+    _BACKGROUND_TASKS.discard(task)
+    if not task.cancelled():
+        task.exception()
 
 
 @mcp.tool()
@@ -75,27 +550,38 @@ async def get_dataset_info() -> str:
     Returns:
         Formatted string with dataset information
     """
-    try:
-        # Fetch dataset metadata from the catalog endpoint
-        result = await make_api_request(f"/catalog/datasets/{DATASET_ID}")
-        
-        # Extract dataset and metadata information
-        dataset = result.get("dataset", {})
-        metas = dataset.get("metas", {}).get("default", {})
-        
-        # Extract info with safe defaults to prevent None formatting errors
-        title = metas.get("title") or "N/A"
-        description = metas.get("description") or "N/A"
-        records_count = metas.get("records_count") or 0
-        fields = dataset.get("fields", [])
-        
-        # Build a formatted list of the first 15 fields
-        fields_text = '\n'.join(
-            f"  - {f.get('name', 'N/A')} ({f.get('type', 'N/A')}): {f.get('label', 'N/A')}" 
-            for f in fields[:15]
-        )
+    global _DATASET_INFO_CACHE
+    
+    # Serve the cached rendering while it is fresh; the lock keeps concurrent
+    # callers from refreshing it more than once
+    async with _DATASET_INFO_LOCK:
+        if (
+            _DATASET_INFO_CACHE is not None
+            and time.monotonic() - _DATASET_INFO_CACHE[0] < DATASET_INFO_TTL
+        ):
+            return _DATASET_INFO_CACHE[1]
         
-        return f"""Paris Trees Dataset Information:
+        try:
+            # Fetch dataset metadata from the catalog endpoint
+            result = await make_api_request(DATASET_ENDPOINT)
+            
+            # Extract dataset and metadata information
+            dataset = result.get("dataset", {})
+            metas = dataset.get("metas", {}).get("default", {})
+            
+            # Extract info with safe defaults to prevent None formatting errors
+            title = metas.get("title") or "N/A"
+            description = metas.get("description") or "N/A"
+            records_count = metas.get("records_count") or 0
+            fields = dataset.get("fields", [])
+            
+            # Build a formatted list of the first 15 fields
+            fields_text = '\n'.join(
+                f"  - {f.get('name', 'N/A')} ({f.get('type', 'N/A')}): {f.get('label', 'N/A')}" 
+                for f in fields[:15]
+            )
+            
+            info = f"""Paris Trees Dataset Information:
         
 Title: {title}
 Total Records: {records_count:,}
@@ -106,8 +592,10 @@ Available Fields:
 {fields_text}
 ... and more fields available.
 """
-    except Exception as e:
-        return f"Error fetching dataset info: {str(e)}"
+            _DATASET_INFO_CACHE = (time.monotonic(), info)
+            return info
+        except Exception as e:
+            return f"Error fetching dataset info: {str(e)}"
 
 
 @mcp.tool()
@@ -116,7 +604,8 @@ async def search_trees(
     limit: int = DEFAULT_LIMIT,
     offset: int = 0,
     select: Optional[str] = None,
-    order_by: Optional[str] = None
+    order_by: Optional[str] = None,
+    output: str = "text"
 ) -> str:
     """
     Search and retrieve Paris trees data with filtering and pagination.
@@ -134,11 +623,15 @@ async def search_trees(
                - "libellefrancais='Platane'"
                - "remarquable='OUI'"
         limit: Number of records to return (max 100, default 20)
-        select: Comma-separated fields to return 
+        select: Comma-separated fields to return (defaults to the fields
+                shown in the output below)
                 Example: "libellefrancais,genre,hauteurenm,adresse"
-        offset: Pagination offset for retrieving more results (default 0)
+        offset: Pagination offset for retrieving more results (default 0,
+                offset + limit at most 10,000)
         order_by: Field to sort by with optional direction
                   Examples: "hauteurenm DESC", "libellefrancais ASC"
+        output: "text" (default) for a formatted listing, or "json" for the
+                raw records as {"total": ..., "results": [...]}
     
     Common Field Names:
         - libellefrancais: French species name
@@ -161,67 +654,73 @@ async def search_trees(
         location, and remarkable status when applicable
     """
     try:
+        # Reject degenerate requests before spending a round trip on them
+        if limit <= 0:
+            return "Error searching trees: limit must be >= 1"
+        if offset < 0:
+            return "Error searching trees: offset must be >= 0"
+        if output not in OUTPUT_FORMATS:
+            return "Error searching trees: output must be 'text' or 'json'"
+        
+        limit = _clamp_limit(limit)
+        if offset + limit > MAX_RESULT_WINDOW:
+            return (
+                f"Error searching trees: offset + limit must not exceed "
+                f"{MAX_RESULT_WINDOW:,}; narrow the query with a where filter instead"
+            )
+        
         # Build query parameters
         params = {
-            "limit": min(limit, MAX_LIMIT),
+            "limit": limit,
             "offset": offset
         }
         
         # Add optional parameters if provided
         if where:
-            params["where"] = where
-        if select:
-            params["select"] = select
+            params["where"] = _normalize_where(where)
+        params["select"] = select if select else _DEFAULT_SELECT
         if order_by:
             params["order_by"] = order_by
         
         # Make API request to records endpoint
-        result = await make_api_request(
-            f"/catalog/datasets/{DATASET_ID}/records",
-            params=params
-        )
+        result = await _get_records(params)
         
         total_count = result.get("total_count", 0)
         records = result.get("results", [])
         
+        has_next_page = (
+            total_count > offset + len(records)
+            and offset + 2 * limit <= MAX_RESULT_WINDOW
+        )
+        
+        # A caller already paging through a text listing usually asks for the
+        # next page right after this one: start fetching it while we format
+        # this page. First pages and JSON calls are mostly one-off queries and
+        # aren't worth a speculative upstream request.
+        if has_next_page and offset > 0 and output == "text":
+            _prefetch_records({**params, "offset": offset + limit})
+        
+        # Machine-readable mode: hand the records back without formatting
+        if output == "json":
+            return _dumps({"total": total_count, "results": records[:limit]})
+        
         if not records:
             return "No trees found matching your criteria."
         
-        output = [f"Found {total_count:,} trees total. Showing {len(records)} results (offset: {offset}):\n"]
+        buf = io.StringIO()
+        buf.write(f"Found {total_count:,} trees total. Showing {len(records)} results (offset: {offset}):\n")
         
         # Format each tree record
-        for i, record in enumerate(records, 1):
-            # IMPORTANT: In API v2.1, data is directly in the record object,
-            # not in record["fields"] like in v1.x
-            tree_info = [
-                f"\n{i}. Tree Information:",
-                f"   Species: {record.get('libellefrancais', 'Unknown')}",
-                f"   Genus: {record.get('genre', 'N/A')}",
-                f"   Height: {record.get('hauteurenm', 'N/A')} m",
-                f"   Circumference: {record.get('circonferenceencm', 'N/A')} cm",
-                f"   District: {record.get('arrondissement', 'N/A')}",
-                f"   Address: {record.get('adresse', 'N/A')}",
-                f"   Stage of Development: {record.get('stadedeveloppement', 'N/A')}",
-            ]
-            
-            # Add remarkable status indicator if tree is heritage-listed
-            remarquable = record.get('remarquable', '')
-            if remarquable and remarquable.lower() == 'oui':
-                tree_info.append(f"   🌟 Remarkable Tree: Yes (heritage tree)")
-            
-            # Add geographic coordinates if available
-            if 'geo_point_2d' in record and record['geo_point_2d']:
-                coords = record['geo_point_2d']
-                if 'lat' in coords and 'lon' in coords:
-                    tree_info.append(f"   Coordinates: {coords['lat']:.6f}, {coords['lon']:.6f}")
-            
-            output.append("\n".join(tree_info))
+        for i, tree in enumerate(map(_parse_tree, records), 1):
+            buf.write(_render_tree(
+                _TREE_TMPL, i, tree, with_remarkable=True, with_coords=True
+            ))
         
         # Add pagination hint if there are more results
-        if total_count > offset + len(records):
-            output.append(f"\n📄 Use offset={offset + limit} to see more results.")
+        if has_next_page:
+            buf.write(f"\n\n📄 Use offset={offset + limit} to see more results.")
         
-        return "\n".join(output)
+        return buf.getvalue()
         
     except Exception as e:
         return f"Error searching trees: {str(e)}\nDebug info: {type(e).__name__}"
@@ -231,7 +730,7 @@ async def search_trees(
 async def get_tree_statistics(
     group_by: str,
     where: Optional[str] = None,
-    limit: int = 20
+    limit: int = DEFAULT_LIMIT
 ) -> str:
     """
     Get aggregated statistics about Paris trees grouped by a specific field.
@@ -262,6 +761,9 @@ async def get_tree_statistics(
         Formatted string with counts per group, sorted by count descending
     """
     try:
+        if limit <= 0:
+            return "Error getting statistics: limit must be >= 1"
+        
         # Build query parameters with required SELECT clause for v2.1 API
         params = {
             "select": f"{group_by}, count(*) as tree_count",
@@ -270,15 +772,21 @@ async def get_tree_statistics(
             "order_by": "tree_count DESC"
         }
         
+        total_params = dict(_TOTAL_PARAMS_BASE)
+        
         # Add optional WHERE filter
         if where:
-            params["where"] = where
+            params["where"] = total_params["where"] = _normalize_where(where)
         
-        # Make API request
-        result = await make_api_request(
-            f"/catalog/datasets/{DATASET_ID}/records",
-            params=params
+        # Fetch the groups and the overall matching count concurrently; the
+        # count is informational, so its failure doesn't fail the tool
+        result, total_result = await asyncio.gather(
+            _get_records(params),
+            _get_records(total_params),
+            return_exceptions=True
         )
+        if isinstance(result, BaseException):
+            raise result
         
         records = result.get("results", [])
         
@@ -287,15 +795,19 @@ async def get_tree_statistics(
         
         output = [f"Statistics grouped by '{group_by}':\n"]
         
-        # Format each group with its count
+        # Format each group with its count, accumulating the total in the
+        # same pass over the records
+        total = 0
         for i, record in enumerate(records, 1):
-            group_value = record.get(group_by, "Unknown")
             count = record.get("tree_count", 0)
-            output.append(f"{i:2d}. {group_value}: {count:,} trees")
+            total += count
+            output.append(f"{i:2d}. {record.get(group_by, 'Unknown')}: {count:,} trees")
         
-        # Add total across displayed groups
-        total = sum(r.get("tree_count", 0) for r in records)
+        # Add total across displayed groups, and across all groups when known
         output.append(f"\nTotal in these groups: {total:,} trees")
+        matching_total = _total_from(total_result)
+        if matching_total is not None:
+            output.append(f"Total matching trees: {matching_total:,} trees")
         
         return "\n".join(output)
         
@@ -308,7 +820,8 @@ async def find_trees_near_location(
     latitude: float,
     longitude: float,
     distance_meters: int = 500,
-    limit: int = 20
+    limit: int = DEFAULT_LIMIT,
+    output: str = "text"
 ) -> str:
     """
     Find trees near a specific geographic location in Paris.
@@ -321,8 +834,10 @@ async def find_trees_near_location(
                   Example: 48.8566 for Paris center
         longitude: Longitude coordinate in WGS84 (decimal degrees)
                    Example: 2.3522 for Paris center
-        distance_meters: Search radius in meters (default 500m)
+        distance_meters: Search radius in meters (default 500m, max 50,000m)
         limit: Maximum number of trees to return (default 20)
+        output: "text" (default) for a formatted listing, or "json" for the
+                raw records as {"total": ..., "results": [...]}
     
     Famous Paris Locations:
         - Eiffel Tower: latitude=48.8584, longitude=2.2945
@@ -332,50 +847,64 @@ async def find_trees_near_location(
         
     Returns:
         Formatted list of trees sorted by distance from the specified point,
-        including species, height, address, and coordinates
+        including species, height, address, distance, and coordinates
     """
     try:
+        if limit <= 0:
+            return "Error finding nearby trees: limit must be >= 1"
+        if output not in OUTPUT_FORMATS:
+            return "Error finding nearby trees: output must be 'text' or 'json'"
+        if not 1 <= distance_meters <= MAX_DISTANCE_METERS:
+            return (
+                f"Error finding nearby trees: distance_meters must be between "
+                f"1 and {MAX_DISTANCE_METERS:,}"
+            )
+        _validate_geo(latitude, longitude)
+        
         # Build WHERE clause using OpenDataSoft's distance() function
         # Syntax: distance(geo_field, geom'POINT(lon lat)', radius)
-        where_clause = f"distance(geo_point_2d, geom'POINT({longitude} {latitude})', {distance_meters}m)"
+        distance_expr = f"distance(geo_point_2d, geom'POINT({longitude} {latitude})'"
         
         params = {
-            "where": where_clause,
-            "limit": min(limit, MAX_LIMIT),
+            **_NEARBY_PARAMS_BASE,
+            "where": f"{distance_expr}, {distance_meters}m)",
+            "limit": _clamp_limit(limit),
             # Order by distance (ascending = nearest first)
-            "order_by": f"distance(geo_point_2d, geom'POINT({longitude} {latitude})') ASC"
+            "order_by": f"{distance_expr}) ASC"
         }
         
-        result = await make_api_request(
-            f"/catalog/datasets/{DATASET_ID}/records",
-            params=params
-        )
+        result = await _get_records(params)
         
         records = result.get("results", [])
         
+        if output == "json":
+            return _dumps({"total": result.get("total_count", 0), "results": records[:limit]})
+        
         if not records:
             return f"No trees found within {distance_meters}m of coordinates ({latitude}, {longitude})."
         
-        output = [f"Found {len(records)} trees within {distance_meters}m of ({latitude:.6f}, {longitude:.6f}):\n"]
+        buf = io.StringIO()
+        buf.write(f"Found {len(records)} trees within {distance_meters}m of ({latitude:.6f}, {longitude:.6f}):\n")
         
         # Format each nearby tree
-        for i, record in enumerate(records, 1):
-            # Extract coordinates
-            coords = record.get('geo_point_2d', {})
-            lat = coords.get('lat', 'N/A')
-            lon = coords.get('lon', 'N/A')
+        for i, tree in enumerate(map(_parse_tree, records), 1):
+            # Records without a usable point render as N/A rather than failing
+            # the whole listing. The distance from the search point is computed
+            # locally from the coordinates already in the payload.
+            if tree.coords:
+                distance = round(_distance_m(latitude, longitude, *tree.coords))
+            else:
+                distance = "N/A"
             
             # Add remarkable indicator if applicable
-            remarquable_status = "🌟 (Remarkable)" if record.get('remarquable', '').lower() == 'oui' else ""
+            remarquable_status = "🌟 (Remarkable)" if tree.remarkable else ""
             
-            output.append(f"""
-{i}. {record.get('libellefrancais', 'Unknown')} {remarquable_status}
-   Height: {record.get('hauteurenm', 'N/A')} m
-   Address: {record.get('adresse', 'N/A')}
-   District: {record.get('arrondissement', 'N/A')}
-   Coordinates: {lat}, {lon}""")
+            buf.write(_render_tree(
+                _NEARBY_TREE_TMPL, i, tree,
+                remarquable_status=remarquable_status, distance=distance
+            ))
         
-        return "\n".join(output)
+        return buf.getvalue()
         
     except Exception as e:
         return f"Error finding nearby trees: {str(e)}"
@@ -383,8 +912,9 @@ async def find_trees_near_location(
 
 @mcp.tool()
 async def find_remarkable_trees(
-    limit: int = 20,
-    arrondissement: Optional[str] = None
+    limit: int = DEFAULT_LIMIT,
+    arrondissement: Optional[str] = None,
+    output: str = "text"
 ) -> str:
     """
     Find remarkable (heritage) trees in Paris.
@@ -399,6 +929,8 @@ async def find_remarkable_trees(
         limit: Maximum number of trees to return (default 20)
         arrondissement: Optional filter by district
                         Example: "PARIS 5E ARR", "BOIS DE BOULOGNE"
+        output: "text" (default) for a formatted listing, or "json" for the
+                raw records as {"total": ..., "results": [...]}
     
     Returns:
         List of remarkable trees sorted by height (tallest first),
@@ -410,56 +942,52 @@ async def find_remarkable_trees(
         - Find top 50 tallest remarkable trees: limit=50
     """
     try:
+        if limit <= 0:
+            return "Error finding remarkable trees: limit must be >= 1"
+        if output not in OUTPUT_FORMATS:
+            return "Error finding remarkable trees: output must be 'text' or 'json'"
+        if arrondissement:
+            arrondissement = arrondissement.strip()
+        if arrondissement and _CONTROL_CHARS.search(arrondissement):
+            return "Error finding remarkable trees: invalid characters in arrondissement."
+        
         # Build WHERE clause for remarkable trees
         where_clause = "remarquable='OUI'"
         if arrondissement:
-            where_clause += f" AND arrondissement='{arrondissement}'"
+            where_clause += f" AND arrondissement={_quote_odsql(arrondissement)}"
         
         params = {
+            **_REMARKABLE_PARAMS_BASE,
             "where": where_clause,
-            "limit": min(limit, MAX_LIMIT),
-            # Sort by height descending to show most impressive trees first
-            "order_by": "hauteurenm DESC"
+            "limit": _clamp_limit(limit)
         }
         
-        result = await make_api_request(
-            f"/catalog/datasets/{DATASET_ID}/records",
-            params=params
-        )
+        result = await _get_records(params)
         
         total_count = result.get("total_count", 0)
         records = result.get("results", [])
         
+        if output == "json":
+            return _dumps({"total": total_count, "results": records[:limit]})
+        
         if not records:
             return "No remarkable trees found matching your criteria."
         
-        output = [
-            f"🌟 Found {total_count:,} remarkable trees in Paris",
-            f"Showing {len(records)} results:\n"
-        ]
+        buf = io.StringIO()
+        buf.write(f"🌟 Found {total_count:,} remarkable trees in Paris\n")
+        buf.write(f"Showing {len(records)} results:\n")
         
         # Format each remarkable tree with full details
-        for i, record in enumerate(records, 1):
-            output.append(f"""
-{i}. {record.get('libellefrancais', 'Unknown')} 🌟
-   Height: {record.get('hauteurenm', 'N/A')} m
-   Circumference: {record.get('circonferenceencm', 'N/A')} cm
-   Address: {record.get('adresse', 'N/A')}
-   District: {record.get('arrondissement', 'N/A')}
-   Stage: {record.get('stadedeveloppement', 'N/A')}""")
-            
-            # Add coordinates if available
-            coords = record.get('geo_point_2d', {})
-            if coords:
-                lat = coords.get('lat', 'N/A')
-                lon = coords.get('lon', 'N/A')
-                output.append(f"   Coordinates: {lat}, {lon}")
+        for i, tree in enumerate(map(_parse_tree, records), 1):
+            buf.write(_render_tree(
+                _REMARKABLE_TREE_TMPL, i, tree, with_coords=True
+            ))
         
         # Add info about remaining trees
         if total_count > len(records):
-            output.append(f"\n📄 {total_count - len(records)} more remarkable trees available.")
+            buf.write(f"\n\n📄 {total_count - len(records)} more remarkable trees available.")
         
-        return "\n".join(output)
+        return buf.getvalue()
         
     except Exception as e:
         return f"Error finding remarkable trees: {str(e)}"
@@ -498,71 +1026,110 @@ async def get_tree_species_info(species_name: str) -> str:
           Check get_tree_statistics(group_by="libellefrancais") for available species.
     """
     try:
+        # Canonicalize so that e.g. "Platane " and "Platane" share one query
+        # (and one cache entry)
+        species_name = species_name.strip()
+        if not species_name:
+            return "Error getting species info: species name must not be empty."
+        if _CONTROL_CHARS.search(species_name):
+            return "Error getting species info: invalid characters in species name."
+        
         # Build WHERE clause to filter by species
-        where_clause = f"libellefrancais='{species_name}'"
+        where_clause = f"libellefrancais={_quote_odsql(species_name)}"
         
         # First query: Get distribution statistics by district
-        # IMPORTANT: Use SELECT with count() aggregation for v2.1 API
-        stats_result = await make_api_request(
-            f"/catalog/datasets/{DATASET_ID}/records",
-            params={
-                "where": where_clause,
-                "select": f"arrondissement, count(*) as tree_count",
-                "group_by": "arrondissement",
-                "limit": 20,
-                "order_by": "tree_count DESC"
-            }
-        )
+        stats_params = {**_SPECIES_STATS_PARAMS_BASE, "where": where_clause}
         
         # Second query: Get tallest examples of this species
-        examples_result = await make_api_request(
-            f"/catalog/datasets/{DATASET_ID}/records",
-            params={
-                "where": where_clause,
-                "limit": 5,
-                "order_by": "hauteurenm DESC"
-            }
+        examples_params = {**_SPECIES_EXAMPLES_PARAMS_BASE, "where": where_clause}
+        
+        # Third query: exact total, which the per-district counts understate
+        # when the species grows in more than 20 districts
+        total_params = {**_TOTAL_PARAMS_BASE, "where": where_clause}
+        
+        # All queries are independent, so run them concurrently. A failure of
+        # one of them still lets us report what the others returned.
+        stats_result, examples_result, total_result = await asyncio.gather(
+            _get_records(stats_params),
+            _get_records(examples_params),
+            _get_records(total_params),
+            return_exceptions=True
         )
+        stats_failed = isinstance(stats_result, BaseException)
+        examples_failed = isinstance(examples_result, BaseException)
         
-        stats = stats_result.get("results", [])
-        examples = examples_result.get("results", [])
+        stats = [] if stats_failed else stats_result.get("results", [])
+        examples = [] if examples_failed else examples_result.get("results", [])
         
-        # Check if species exists in dataset
+        # Check if species exists in dataset; an empty answer only counts as
+        # "not found" if neither query failed
         if not stats and not examples:
+            if stats_failed:
+                raise stats_result
+            if examples_failed:
+                raise examples_result
             return f"No trees found for species '{species_name}'. Please check the spelling."
         
-        # Calculate total count across all districts
-        total_count = sum(s.get("tree_count", 0) for s in stats)
+        # Format the distribution lines (top 10 districts)
+        district_lines = [
+            _DISTRICT_LINE_TMPL.format(
+                stat.get("arrondissement", "Unknown"), stat.get("tree_count", 0)
+            )
+            for stat in stats[:10]
+        ]
+        
+        # Prefer the exact count; fall back to summing the district groups
+        total_count = _total_from(total_result)
+        if total_count is None and not stats_failed:
+            total_count = sum(stat.get("tree_count", 0) for stat in stats)
         
-        output = [f"Information about '{species_name}' in Paris:\n"]
-        output.append(f"Total count: {total_count:,} trees\n")
+        buf = io.StringIO()
+        buf.write(f"Information about '{species_name}' in Paris:\n")
+        if total_count is None:
+            buf.write("\nTotal count: unavailable (statistics requests failed)\n")
+        else:
+            buf.write(f"\nTotal count: {total_count:,} trees\n")
         
-        # Display district distribution
-        if stats:
-            output.append("Distribution by district:")
-            for stat in stats[:10]:  # Show top 10 districts
-                district = stat.get("arrondissement", "Unknown")
-                count = stat.get("tree_count", 0)
-                output.append(f"  - {district}: {count:,} trees")
+        # Display district distribution; a failed query is reported rather
+        # than leaving the section out as if there were no data
+        if stats_failed:
+            buf.write("\nDistribution by district: (unavailable: request failed)")
+        elif district_lines:
+            buf.write("\nDistribution by district:")
+            buf.write("".join(district_lines))
         
         # Display tallest examples
-        if examples:
-            output.append(f"\nTallest examples:")
-            for i, tree in enumerate(examples, 1):
+        if examples_failed:
+            buf.write("\n\nTallest examples: (unavailable: request failed)")
+        elif examples:
+            buf.write("\n\nTallest examples:")
+            for i, tree in enumerate(map(_parse_tree, examples), 1):
                 # Add star indicator for remarkable trees
-                remarquable_indicator = " 🌟" if tree.get('remarquable', '').lower() == 'oui' else ""
-                output.append(f"""
-  {i}. Height: {tree.get('hauteurenm', 'N/A')} m{remarquable_indicator}
-     Location: {tree.get('adresse', 'N/A')}
-     District: {tree.get('arrondissement', 'N/A')}
-     Circumference: {tree.get('circonferenceencm', 'N/A')} cm""")
+                remarquable_indicator = " 🌟" if tree.remarkable else ""
+                buf.write(_render_tree(
+                    _SPECIES_EXAMPLE_TMPL, i, tree,
+                    remarquable_indicator=remarquable_indicator
+                ))
         
-        return "\n".join(output)
+        return buf.getvalue()
         
     except Exception as e:
+        if isinstance(e, httpx.HTTPStatusError):
+            return (
+                f"Error getting species info: API returned "
+                f"{e.response.status_code} for '{species_name}'"
+            )
         return f"Error getting species info: {str(e)}"
 
 
 # Entry point for running the MCP server
 if __name__ == "__main__":
+    # uvloop is a faster drop-in event loop; it is optional and not
+    # available on Windows
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     mcp.run()
\ No newline at end of file
@@ -4,6 +4,8 @@ import sys
 sys.path.insert(0, 'src')
 
 from mcp_arbres_paris import (
+    _normalize_where,
+    close_client,
     get_dataset_info,
     search_trees,
     get_tree_statistics,
@@ -11,6 +13,26 @@ from mcp_arbres_paris import (
     get_tree_species_info
 )
 
+def test_normalize_where():
+    # (user input, normalized where clause); runs offline
+    cases = [
+        ("HAUTEURENM>25", "hauteurenm > 25"),
+        ("hauteurenm  >=  25", "hauteurenm >= 25"),
+        ("genre<>'Platanus'", "genre <> 'Platanus'"),
+        ('genre!="Acer"', 'genre != "Acer"'),
+        ("adresse='RUE  DE>LA PAIX'", "adresse = 'RUE  DE>LA PAIX'"),
+        ("adresse='L\\'ILE  X'", "adresse = 'L\\'ILE  X'"),
+        (
+            "within_distance(GEO_POINT_2D, geom'POINT(2.35  48.85)', 100m)",
+            "within_distance(geo_point_2d, geom'POINT(2.35  48.85)', 100m)",
+        ),
+        ("a=>b", "a=>b"),
+    ]
+    for where, expected in cases:
+        result = _normalize_where(where)
+        assert result == expected, f"{where!r}: {result!r} != {expected!r}"
+    print(f"_normalize_where: {len(cases)} cases OK")
+
 async def test_all_functions():
     print("=" * 60)
     print("Testing MCP Arbres Paris Server")
@@ -49,6 +71,9 @@ async def test_all_functions():
     print("=" * 60)
     print("All tests completed!")
     print("=" * 60)
+    
+    await close_client()
 
 if __name__ == "__main__":
+    test_normalize_where()
     asyncio.run(test_all_functions())
\ No newline at end of file